@@ -0,0 +1,136 @@
+# Native Access Geometry for the STK Master Integration Certification Script
+
+# Reproduces the access geometry of the FacsToSensors and AcftToSensors chains
+# with numpy, on Earth-fixed positions taken from the ephemeris cache: a
+# ground object sees a sensor when the satellite is above its minimum
+# elevation angle and the ground object lies inside the sensor's simple conic
+# field of view. Sensors are taken as pointing along the geocentric nadir,
+# which is where the default satellite attitude points their boresight.
+##############################################################################
+##############################################################################
+
+#Import basic utilities
+import numpy as np
+
+#WGS84 ellipsoid (km)
+EARTH_EQUATORIAL_RADIUS = 6378.137
+EARTH_FLATTENING = 1 / 298.257223563
+EARTH_ECC_SQUARED = EARTH_FLATTENING * (2 - EARTH_FLATTENING)
+
+##############################################################################
+##############################################################################
+
+def geodeticToFixed(latitude, longitude, altitude=0.0):
+    """Convert geodetic latitude, longitude (deg) and altitude (km) to
+    Earth-fixed Cartesian positions (km), returned as an (..., 3) array."""
+    lat = np.radians(latitude)
+    lon = np.radians(longitude)
+    altitude = np.asarray(altitude, dtype=np.float64)
+
+    primeVertical = EARTH_EQUATORIAL_RADIUS / np.sqrt(1 - EARTH_ECC_SQUARED * np.sin(lat)**2)
+
+    x = (primeVertical + altitude) * np.cos(lat) * np.cos(lon)
+    y = (primeVertical + altitude) * np.cos(lat) * np.sin(lon)
+    z = (primeVertical * (1 - EARTH_ECC_SQUARED) + altitude) * np.sin(lat)
+    return np.stack(np.broadcast_arrays(x, y, z), axis=-1)
+
+def surfaceNormal(groundPositions):
+    """Unit geodetic up vectors at Earth-fixed positions (..., 3)."""
+    normal = np.array(groundPositions, dtype=np.float64, copy=True)
+    normal[..., 2] /= (1 - EARTH_ECC_SQUARED)
+    return normal / np.linalg.norm(normal, axis=-1, keepdims=True)
+
+##############################################################################
+##############################################################################
+
+def observerPositions(observer, times):
+    """Earth-fixed positions (km) of an observer (eg. a StreamingAccess
+    Observer, whose position is fixed or an Ephemeris) at times: (3,) for a
+    fixed observer, or (T, 3) for a moving one, NaN outside its ephemeris."""
+    position = observer.position
+    if not hasattr(position, "interpolate"):
+        return np.asarray(position, dtype=np.float64)
+
+    #Moving observer: no position (and no access) outside its ephemeris
+    positions = np.full((len(times), 3), np.nan)
+    valid = (times >= position.times[0]) & (times <= position.times[-1])
+    if np.any(valid):
+        positions[valid] = position.interpolate(times[valid])[0]
+    return positions
+
+def accessMargin(groundPositions, satPositions, halfAngle, minElevation=0.0):
+    """Access margin (deg) between ground objects and nadir-pointed sensors.
+
+    groundPositions is (..., 3) and satPositions is (..., 3), broadcast
+    against each other. The margin is the smaller of the elevation margin
+    (elevation - minElevation) and the cone margin (halfAngle - off-nadir
+    angle), so access exists wherever the margin is non-negative. Being a
+    continuous function of time, it also locates AOS/LOS between samples.
+    """
+    lineOfSight = satPositions - groundPositions
+    rangeKm = np.linalg.norm(lineOfSight, axis=-1)
+
+    up = surfaceNormal(groundPositions)
+    sinElevation = np.sum(lineOfSight * up, axis=-1) / rangeKm
+    elevation = np.degrees(np.arcsin(np.clip(sinElevation, -1, 1)))
+
+    cosOffNadir = np.sum(lineOfSight * satPositions, axis=-1) / \
+                  (rangeKm * np.linalg.norm(satPositions, axis=-1))
+    offNadir = np.degrees(np.arccos(np.clip(cosOffNadir, -1, 1)))
+
+    return np.minimum(elevation - minElevation, halfAngle - offNadir)
+
+def crossingTimes(times, margin, idx):
+    # Linearly interpolate the zero crossing of the margin between samples
+    # idx and idx + 1.
+    m0, m1 = margin[idx], margin[idx + 1]
+    fraction = m0 / (m0 - m1)
+    return times[idx] + fraction * (times[idx + 1] - times[idx])
+
+def marginToIntervals(times, margin):
+    """Turn a sampled access margin into a list of (start, stop, duration)
+    intervals, with AOS/LOS interpolated between samples. Intervals still
+    open at either end are clipped to the first/last sample time."""
+    visible = margin >= 0
+    if not np.any(visible):
+        return []
+
+    change = np.flatnonzero(visible[1:] != visible[:-1])
+    rises = change[~visible[change]]
+    sets = change[visible[change]]
+
+    starts = crossingTimes(times, margin, rises)
+    stops = crossingTimes(times, margin, sets)
+    if visible[0]:
+        starts = np.concatenate(([times[0]], starts))
+    if visible[-1]:
+        stops = np.concatenate((stops, [times[-1]]))
+
+    return [(float(start), float(stop), float(stop - start))
+            for start, stop in zip(starts, stops)]
+
+def mergeIntervals(intervals):
+    """Merge overlapping or touching (start, stop, duration) intervals, eg.
+    the pieces of one access split across adjacent time windows."""
+    merged = []
+    for start, stop, _ in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            stop = max(stop, merged[-1][1])
+            start = merged.pop()[0]
+        merged.append((start, stop, stop - start))
+    return merged
+
+def maxOutage(intervals):
+    """Longest gap between consecutive intervals, as (duration, start, stop),
+    or None if coverage is continuous."""
+    if len(intervals) < 2:
+        return None
+
+    gaps = [(nextStart - stop, stop, nextStart)
+            for (_, stop, _), (nextStart, _, _) in zip(intervals[:-1], intervals[1:])]
+    return max(gaps)
+
+##############################################################################
+##############################################################################
+
+#End
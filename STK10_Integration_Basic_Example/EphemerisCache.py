@@ -0,0 +1,335 @@
+# Ephemeris Cache for the STK Master Integration Certification Script
+
+# Stores coarse-step Earth-fixed state vectors of STK vehicles (satellites and
+# aircraft) in compact float64 arrays, and answers arbitrary-time or fine-grid
+# queries by vectorised Hermite (or Lagrange) interpolation, so that access
+# work at fine steps does not make STK re-evaluate every position from scratch.
+##############################################################################
+##############################################################################
+
+#Import basic utilities
+from collections import OrderedDict
+import numpy as np
+
+##############################################################################
+##############################################################################
+
+# Interpolation kernels. These only need numpy, so that they can also be used
+# by worker processes that have no access to the STK Object Model.
+
+# Maximum number of query times interpolated in one vectorised block. The
+# basis computation builds (block, points, points) arrays, so this bounds the
+# temporary memory regardless of how fine the requested grid is.
+QUERY_BLOCK = 65536
+
+def _windowIndices(times, queryTimes, numPoints):
+    # For every query time, pick the numPoints nodes centred around it,
+    # shifted inwards at both ends of the ephemeris span.
+    idx = np.searchsorted(times, queryTimes)
+    first = np.clip(idx - numPoints // 2, 0, len(times) - numPoints)
+    return first[:, None] + np.arange(numPoints)
+
+def _lagrangeBasis(nodeTimes, queryTimes):
+    # nodeTimes is (Q, n) and queryTimes is (Q,). Returns the (Q, n) Lagrange
+    # basis L_i(t) and the (Q, n) Hermite coefficients sum_j 1/(t_i - t_j).
+    n = nodeTimes.shape[1]
+    eye = np.eye(n, dtype=bool)
+
+    diffs = nodeTimes[:, :, None] - nodeTimes[:, None, :]   # t_i - t_j
+    diffs[:, eye] = 1.0
+
+    offsets = queryTimes[:, None] - nodeTimes                 # t - t_j
+    numer = np.broadcast_to(offsets[:, None, :], diffs.shape).copy()
+    numer[:, eye] = 1.0
+
+    basis = np.prod(numer / diffs, axis=2)
+
+    inverse = 1.0 / diffs
+    inverse[:, eye] = 0.0
+    return basis, inverse.sum(axis=2)
+
+def interpolateStates(times, positions, velocities, queryTimes, numPoints=6):
+    """Interpolate (positions, velocities) at queryTimes.
+
+    Positions use Hermite interpolation on positions and velocities when
+    velocities are given, and Lagrange interpolation otherwise. Velocities
+    are always Lagrange-interpolated from the velocity samples (or are None).
+    positions and velocities are (N, ..., 3), so several objects sampled at
+    the same times can share one basis computation.
+    """
+    queryTimes = np.atleast_1d(np.asarray(queryTimes, dtype=np.float64))
+    numPoints = min(numPoints, len(times))
+
+    outPos = np.empty((len(queryTimes),) + positions.shape[1:])
+    outVel = None if velocities is None else np.empty_like(outPos)
+
+    for first in range(0, len(queryTimes), QUERY_BLOCK):
+        block = slice(first, first + QUERY_BLOCK)
+        t = queryTimes[block]
+
+        nodes = _windowIndices(times, t, numPoints)
+        nodeTimes = times[nodes]
+        basis, coeffs = _lagrangeBasis(nodeTimes, t)
+
+        if velocities is None:
+            outPos[block] = np.einsum("qi,qi...->q...", basis, positions[nodes])
+            continue
+
+        #Hermite basis functions for the node values and node derivatives
+        offsets = t[:, None] - nodeTimes
+        basisSq = basis * basis
+        hValue = (1.0 - 2.0 * coeffs * offsets) * basisSq
+        hSlope = offsets * basisSq
+
+        outPos[block] = (np.einsum("qi,qi...->q...", hValue, positions[nodes]) +
+                         np.einsum("qi,qi...->q...", hSlope, velocities[nodes]))
+        outVel[block] = np.einsum("qi,qi...->q...", basis, velocities[nodes])
+
+    return outPos, outVel
+
+##############################################################################
+##############################################################################
+
+class Ephemeris:
+    """Coarse-step Earth-fixed ephemeris of a single STK object.
+
+    Times are in scenario epoch seconds, positions in km and velocities in
+    km/sec, all in the object's central body fixed frame. horizon is the
+    (start, stop) span it was sampled over, or None for the scenario span.
+    """
+
+    def __init__(self, path, times, positions, velocities=None,
+                 numPoints=6, fingerprint=None, horizon=None):
+        self.path = path
+        self.times = np.ascontiguousarray(times, dtype=np.float64)
+        self.positions = np.ascontiguousarray(positions, dtype=np.float64)
+        self.velocities = None if velocities is None else \
+            np.ascontiguousarray(velocities, dtype=np.float64)
+        self.numPoints = numPoints
+        self.fingerprint = fingerprint
+        self.horizon = horizon
+        self.errorBound = self.estimateError()
+
+    @property
+    def nbytes(self):
+        total = self.times.nbytes + self.positions.nbytes
+        if self.velocities is not None:
+            total += self.velocities.nbytes
+        return total
+
+    @property
+    def method(self):
+        return "Lagrange" if self.velocities is None else "Hermite"
+
+    def estimateError(self):
+        # Interpolate the odd-numbered samples from the even-numbered ones,
+        # ie. at twice the stored step size. Interpolation error grows with
+        # the step size, so the worst miss at double the step is a
+        # conservative bound (in km) on the error at the stored step.
+        if len(self.times) < 2 * self.numPoints + 1:
+            return np.inf
+
+        velocities = None if self.velocities is None else self.velocities[::2]
+        predicted, _ = interpolateStates(self.times[::2], self.positions[::2],
+                                         velocities, self.times[1::2],
+                                         self.numPoints)
+
+        return float(np.max(np.linalg.norm(predicted - self.positions[1::2],
+                                           axis=1)))
+
+    def interpolate(self, queryTimes):
+        queryTimes = np.asarray(queryTimes, dtype=np.float64)
+        if np.any(queryTimes < self.times[0]) or \
+           np.any(queryTimes > self.times[-1]):
+            raise ValueError(f"{self.path}: query times outside the cached "
+                             f"span {self.times[0]} to {self.times[-1]} EpSec")
+
+        return interpolateStates(self.times, self.positions, self.velocities,
+                                 queryTimes, self.numPoints)
+
+##############################################################################
+##############################################################################
+
+def propagatorFingerprint(stkObject):
+    """Summarise the propagator settings of a satellite or aircraft.
+
+    The cache compares this against the value stored with each ephemeris, so
+    any change to the propagator settings, or to the scenario time span the
+    ephemeris is sampled over, invalidates the cached states. Only the
+    TwoBody, J2 and J4 satellite propagators and the GreatArc aircraft route
+    are summarised; for any other propagator this returns None, and the
+    cache resamples the object on every lookup rather than risk stale states.
+    """
+    from comtypes.gen import STKObjects
+    from comtypes.gen import STKUtil
+
+    scenario2 = stkObject.Root.CurrentScenario.QueryInterface(STKObjects.IAgScenario)
+    fingerprint = [str(scenario2.StartTime), str(scenario2.StopTime)]
+
+    initialStatePropagators = {
+        STKObjects.ePropagatorTwoBody: STKObjects.IAgVePropagatorTwoBody,
+        STKObjects.ePropagatorJ2Perturbation: STKObjects.IAgVePropagatorJ2Perturbation,
+        STKObjects.ePropagatorJ4Perturbation: STKObjects.IAgVePropagatorJ4Perturbation}
+
+    if stkObject.ClassType == STKObjects.eSatellite:
+        satellite2 = stkObject.QueryInterface(STKObjects.IAgSatellite)
+        if satellite2.PropagatorType not in initialStatePropagators:
+            return None
+
+        propagator = satellite2.Propagator.QueryInterface(initialStatePropagators[satellite2.PropagatorType])
+        initialState = propagator.InitialState.Representation
+        cartesian = initialState.ConvertTo(STKUtil.eOrbitStateCartesian).QueryInterface(STKObjects.IAgOrbitStateCartesian)
+
+        fingerprint += [satellite2.PropagatorType, propagator.Step, str(initialState.Epoch),
+                        cartesian.XPosition, cartesian.YPosition, cartesian.ZPosition,
+                        cartesian.XVelocity, cartesian.YVelocity, cartesian.ZVelocity]
+        return tuple(fingerprint)
+
+    if stkObject.ClassType == STKObjects.eAircraft:
+        aircraft2 = stkObject.QueryInterface(STKObjects.IAgAircraft)
+        if aircraft2.RouteType != STKObjects.ePropagatorGreatArc:
+            return None
+
+        route = aircraft2.Route.QueryInterface(STKObjects.IAgVePropagatorGreatArc)
+        fingerprint += [aircraft2.RouteType, route.Method,
+                        str(route.EphemerisInterval.FindStartTime()),
+                        tuple(tuple(row) for row in route.Waypoints.ToArray())]
+        return tuple(fingerprint)
+
+    return None
+
+##############################################################################
+##############################################################################
+
+class EphemerisCache:
+    """Size-bounded cache of coarse ephemerides, keyed by STK object path.
+
+    Each object is sampled once, over the scenario or a given horizon,
+    through its 'Cartesian Position' and 'Cartesian Velocity' (Fixed) data
+    providers at stepSize seconds. If the
+    resulting interpolation error bound exceeds tolerance (km), the step is
+    halved and the object resampled, down to minStepSize. Least recently used
+    entries are evicted once the cached arrays exceed maxBytes. An object is
+    resampled whenever its propagatorFingerprint changes, and on every lookup
+    if its propagator is one the fingerprint does not summarise.
+    """
+
+    def __init__(self, stkRoot, stepSize=60.0, numPoints=6, tolerance=1e-3,
+                 minStepSize=1.0, maxBytes=64 * 2**20):
+        self.stkRoot = stkRoot
+        self.stepSize = stepSize
+        self.numPoints = numPoints
+        self.tolerance = tolerance
+        self.minStepSize = minStepSize
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+
+    @property
+    def nbytes(self):
+        return sum(entry.nbytes for entry in self.entries.values())
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def invalidate(self, path=None):
+        # Drop one object's ephemeris, or everything if no path is given.
+        if path is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(path, None)
+
+    def get(self, stkObject, start=None, stop=None):
+        """Return the Ephemeris of stkObject, sampling it from STK if needed.
+
+        By default the ephemeris spans the scenario. Given a start and stop
+        (EpSec), it only needs to span that horizon, which may lie outside
+        the scenario as long as the object's propagator covers it. A cached
+        ephemeris spanning the horizon is reused; otherwise the object is
+        sampled over the horizon alone, replacing its cached ephemeris.
+        """
+        if (start is None) != (stop is None):
+            raise ValueError("give both start and stop, or neither")
+
+        path = stkObject.Path
+        fingerprint = propagatorFingerprint(stkObject)
+
+        #A None fingerprint means the settings are unknown: always resample
+        entry = self.entries.get(path)
+        if entry is not None and fingerprint is not None and entry.fingerprint == fingerprint:
+            if start is None:
+                covered = entry.horizon is None
+            else:
+                covered = entry.times[0] <= start and entry.times[-1] >= stop
+            if covered:
+                self.entries.move_to_end(path)
+                return entry
+
+        #Missing, outside the horizon, or the propagator settings changed
+        #since it was sampled
+        self.entries.pop(path, None)
+
+        horizon = None if start is None else (float(start), float(stop))
+        stepSize = self.stepSize
+        entry = self._sample(stkObject, stepSize, fingerprint, horizon)
+        while entry.errorBound > self.tolerance and stepSize / 2 >= self.minStepSize:
+            stepSize /= 2
+            entry = self._sample(stkObject, stepSize, fingerprint, horizon)
+
+        self.entries[path] = entry
+        self._evict()
+        return entry
+
+    def interpolate(self, stkObject, queryTimes):
+        """Return (positions, velocities) of stkObject at queryTimes (EpSec)."""
+        return self.get(stkObject).interpolate(queryTimes)
+
+    def _evict(self):
+        # Always keep the most recently used entry, even if it alone is
+        # larger than maxBytes.
+        while len(self.entries) > 1 and self.nbytes > self.maxBytes:
+            self.entries.popitem(last=False)
+
+    def _sample(self, stkObject, stepSize, fingerprint, horizon=None):
+        from comtypes.gen import STKObjects
+
+        unitPrefs = self.stkRoot.UnitPreferences
+        previousUnits = {dim: unitPrefs.GetCurrentUnitAbbrv(dim)
+                         for dim in ("DateFormat", "DistanceUnit", "TimeUnit")}
+
+        #Sample in epoch seconds, km and km/sec
+        unitPrefs.SetCurrentUnit("DateFormat", "EpSec")
+        unitPrefs.SetCurrentUnit("DistanceUnit", "km")
+        unitPrefs.SetCurrentUnit("TimeUnit", "sec")
+
+        try:
+            if horizon is None:
+                scenario2 = self.stkRoot.CurrentScenario.QueryInterface(STKObjects.IAgScenario)
+                start, stop = scenario2.StartTime, scenario2.StopTime
+            else:
+                start, stop = horizon
+
+            states = []
+            for providerName in ("Cartesian Position", "Cartesian Velocity"):
+                provider = stkObject.DataProviders.Item(providerName).QueryInterface(STKObjects.IAgDataProviderGroup)
+                result = provider.Group.Item("Fixed").QueryInterface(STKObjects.IAgDataPrvTimeVar).ExecElements(start, stop, stepSize, ["Time", "x", "y", "z"])
+                states.append(np.array(result.DataSets.ToArray(), dtype=np.float64))
+
+        finally:
+            for dim, unit in previousUnits.items():
+                unitPrefs.SetCurrentUnit(dim, unit)
+
+        #STK only returns samples within the propagator's ephemeris interval
+        if horizon is not None and (len(states[0]) == 0 or states[0][0, 0] > start or
+                                    states[0][-1, 0] < stop):
+            raise ValueError(f"{stkObject.Path}: the propagator does not cover "
+                             f"{start} to {stop} EpSec")
+
+        return Ephemeris(stkObject.Path, states[0][:, 0], states[0][:, 1:],
+                         states[1][:, 1:], self.numPoints, fingerprint, horizon)
+
+##############################################################################
+##############################################################################
+#End
@@ -747,4 +747,109 @@ for idx, el in enumerate(els):
 ##############################################################################
 ##############################################################################
 
+# The LLA State above is sampled at 600 seconds, but access work needs much
+# finer steps. Rather than asking STK to re-evaluate positions at every fine
+# step, sample each object once at a coarse step into an ephemeris cache and
+# interpolate. The cache resamples an object by itself whenever its
+# propagator settings change.
+from EphemerisCache import EphemerisCache
+
+ephemerisCache = EphemerisCache(stkRoot, stepSize=60.0, tolerance=1e-3)
+
+for satellite in scenario.Children.GetElements(STKObjects.eSatellite):
+    ephemerisCache.get(satellite)
+
+aircraftEphemeris = ephemerisCache.get(aircraft)
+
+#Query the aircraft every 10 seconds over its flight (epoch seconds, km)
+fineTimes = np.arange(aircraftEphemeris.times[0], aircraftEphemeris.times[-1], 10.0)
+aircraftPositions, aircraftVelocities = aircraftEphemeris.interpolate(fineTimes)
+
+print("\nEphemeris cache:")
+print(f"{len(ephemerisCache)} objects, {ephemerisCache.nbytes} bytes")
+print(f"Aircraft: {aircraftEphemeris.method} interpolation of {len(fineTimes)} "
+      f"points, error bound {aircraftEphemeris.errorBound:.3e} km")
+
+##############################################################################
+##############################################################################
+
+# The later blocks evaluate access natively on the cached ephemerides, from
+# the Earth-fixed positions of the facilities.
+from AccessGeometry import geodeticToFixed
+
+facilityNames = []
+facilityPositions = []
+for facility in scenario.Children.GetElements(STKObjects.eFacility):
+    facility2 = facility.QueryInterface(STKObjects.IAgFacility)
+    lat, lon, alt = facility2.Position.QueryPlanetodetic() #deg, deg, km
+    facilityNames.append(facility.InstanceName)
+    facilityPositions.append(geodeticToFixed(lat, lon, alt))
+
+satelliteEphemerides = [ephemerisCache.get(satellite) for satellite in scenario.Children.GetElements(STKObjects.eSatellite)]
+
+# The FacsToSensors access can also be split across worker processes. The
+# workers are spawned, and spawning re-runs the launching script in each of
+# them, so this lives in its own guarded script. With this scenario still open
+# in STK, run "python ParallelAccessExample.py".
+
+##############################################################################
+##############################################################################
+
+# In operations, access answers are needed continuously as time advances
+# rather than once for the whole day. Stream access in 10 minute windows for
+# the facilities and the aircraft, which (like AcftToSensors) uses the
+# degraded sensor constellation without Sensor11 and a 10 degree minimum
+# elevation. An OUTAGE event is raised after 30 minutes without access.
+# The satellites are sampled through the cache one window ahead as the stream
+# advances, so it can run past the scenario span for as long as their
+# propagators cover it; here it stops at the end of the scenario.
+from StreamingAccess import Observer, StreamingAccess
+
+satellites = list(scenario.Children.GetElements(STKObjects.eSatellite))
+satelliteNames = [satellite.InstanceName for satellite in satellites]
+degradedSensors = [satNum for satNum, satName in enumerate(satelliteNames) if satName != "Sat11"]
+
+observers = [Observer(facilityName, facilityPosition, 0.0, None)
+             for facilityName, facilityPosition in zip(facilityNames, facilityPositions)]
+observers.append(Observer(aircraft.InstanceName, aircraftEphemeris, 10.0, degradedSensors))
+
+def sampleSatellites(start, stop):
+    return [ephemerisCache.get(satellite, start, stop) for satellite in satellites]
+
+streamingAccess = StreamingAccess(sampleSatellites, observers, halfAngle=62.5,
+                                  windowSize=600.0, sampleStep=10.0, outageThreshold=1800.0)
+
+print("\nStreaming access events (EpSec):")
+for window in streamingAccess.stream(satelliteEphemerides[0].times[0], satelliteEphemerides[0].times[-1]):
+    for event in window.events:
+        print(f"{event.time:10.1f} {event.name:15} {event.kind}")
+
+print("\nStreaming latency per window step (sec):")
+print(streamingAccess.latencySummary())
+
+##############################################################################
+##############################################################################
+
+# The chains above only model one hop, from a facility or the aircraft to a
+# sensor. Relaying through inter-satellite links lets Fac01 reach the other
+# facilities and the aircraft through the whole constellation. Satellites in
+# the same plane are 45 degrees (about 5500 km) apart, so allow ISLs up to
+# 6000 km.
+from LinkGraph import LinkGraph
+
+linkGraph = LinkGraph(satelliteEphemerides, observers, halfAngle=62.5,
+                      maxIslRange=6000.0, grazingAltitude=100.0)
+
+relayPairs = [(facilityNames[0], observer.name) for observer in observers[1:]]
+relayAccess = linkGraph.solve(np.arange(satelliteEphemerides[0].times[0], satelliteEphemerides[0].times[-1], 60.0), relayPairs)
+
+print("\nRelay availability (intervals, fraction of time, first path):")
+for pairNum, pair in enumerate(relayPairs):
+    firstPath = next((path for path in relayAccess.paths[pair] if path is not None), None)
+    print(f"{pair[0]} to {pair[1]}: {len(relayAccess.intervals[pair])}, "
+          f"{relayAccess.reachable[:, pairNum].mean():.3f}, {firstPath}")
+
+##############################################################################
+##############################################################################
+
 #End
\ No newline at end of file
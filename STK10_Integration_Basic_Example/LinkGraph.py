@@ -0,0 +1,212 @@
+# Time-Varying Link Graph for the STK Master Integration Certification Script
+
+# The FacsToSensors and AcftToSensors chains only model a direct hop from a
+# facility or aircraft to a sensor. This builds, for every timestep, a sparse
+# connectivity graph of the ground objects and the satellites: ground links
+# where the ground object is inside a satellite's sensor cone and above its
+# minimum elevation, and inter-satellite links (ISLs) between satellites in
+# range of each other whose line of sight clears the Earth. Lowest-latency
+# relay paths between ground objects are then found for all timesteps, and
+# returned as availability intervals in the same form as chain access.
+
+# Each ground object appears twice in the graph, as a transmitter with links
+# up to the satellites and as a receiver with links down from them, so paths
+# only ever relay through satellites, never through other ground objects.
+# Candidate links come from k-d trees, so each timestep costs O(N log N) in
+# the number of nodes rather than O(N^2), which scales to thousands of nodes.
+##############################################################################
+##############################################################################
+
+#Import basic utilities
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from AccessGeometry import accessMargin, marginToIntervals, observerPositions
+
+#Speed of light (km/sec)
+SPEED_OF_LIGHT = 299792.458
+
+#Polar radius (km), the lowest a ground object's geocentric radius can be
+EARTH_POLAR_RADIUS = 6356.752
+
+#Mean Earth radius (km), for ISL line of sight
+EARTH_MEAN_RADIUS = 6371.0
+
+# Number of timesteps whose satellite positions are interpolated at once
+TIME_BLOCK = 256
+
+##############################################################################
+##############################################################################
+
+class LinkGraphResult:
+    """Lowest-latency paths between (source, destination) ground objects.
+
+    latency is (timesteps, pairs) one-way latency in seconds, inf where the
+    destination is unreachable. paths maps each pair to a list of node name
+    tuples per timestep (None where unreachable), and intervals maps each
+    pair to its (start, stop, duration) availability intervals.
+    """
+
+    def __init__(self, times, pairs, latency, paths):
+        self.times = times
+        self.pairs = pairs
+        self.latency = latency
+        self.paths = paths
+        self.reachable = np.isfinite(latency)
+
+        # Reachability is only known at the timesteps, so availability is
+        # taken to change halfway between them.
+        self.intervals = {pair: marginToIntervals(times, np.where(reachable, 1.0, -1.0))
+                          for pair, reachable in zip(pairs, self.reachable.T)}
+
+##############################################################################
+##############################################################################
+
+class LinkGraph:
+    """Time-varying connectivity of ground objects through the constellation.
+
+    ephemerides are the cached Ephemeris objects of the satellites, and
+    groundNodes are StreamingAccess Observers (facilities or aircraft, with
+    their minimum elevation and the satellites whose sensors they can use).
+    halfAngle (deg) is the sensor cone half angle, one value or one per
+    satellite. Satellites within maxIslRange (km) of each other are linked
+    when their line of sight stays grazingAltitude (km) above the Earth.
+    """
+
+    def __init__(self, ephemerides, groundNodes, halfAngle, maxIslRange=5000.0,
+                 grazingAltitude=100.0):
+        self.ephemerides = list(ephemerides)
+        self.groundNodes = list(groundNodes)
+        self.halfAngle = np.broadcast_to(np.asarray(halfAngle, dtype=np.float64),
+                                         (len(self.ephemerides),))
+        self.maxIslRange = maxIslRange
+        self.grazingAltitude = grazingAltitude
+
+        numSats = len(self.ephemerides)
+        numGround = len(self.groundNodes)
+
+        # Node order: satellites, ground transmitters, ground receivers
+        self.satNames = [ephemeris.path.split("/")[-1] for ephemeris in self.ephemerides]
+        self.nodeNames = self.satNames + [node.name for node in self.groundNodes] * 2
+        self.numNodes = numSats + 2 * numGround
+
+        # (ground, satellite) pairs allowed to link at all
+        self.allowed = np.ones((numGround, numSats), dtype=bool)
+        for row, node in enumerate(self.groundNodes):
+            if node.sensors is not None:
+                self.allowed[row] = False
+                self.allowed[row, node.sensors] = True
+
+    def _groundLinks(self, groundPositions, satPositions):
+        # (ground, satellite, range) of every ground link at one timestep
+        valid = ~np.isnan(groundPositions).any(axis=1)
+        if not np.any(valid):
+            return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+
+        #No ground object sees a satellite beyond its horizon distance
+        maxRadius = np.linalg.norm(satPositions, axis=1).max()
+        maxAltitude = np.linalg.norm(groundPositions[valid], axis=1).max() - EARTH_POLAR_RADIUS
+        horizonRange = np.sqrt(maxRadius**2 - EARTH_POLAR_RADIUS**2) + max(maxAltitude, 0.0)
+
+        groundIdx = np.flatnonzero(valid)
+        candidates = cKDTree(groundPositions[valid]).sparse_distance_matrix(
+            cKDTree(satPositions), horizonRange, output_type="ndarray")
+        ground, sats = groundIdx[candidates["i"]], candidates["j"]
+
+        keep = self.allowed[ground, sats]
+        ground, sats, ranges = ground[keep], sats[keep], candidates["v"][keep]
+
+        minElevation = np.array([node.minElevation for node in self.groundNodes])
+        margin = accessMargin(groundPositions[ground], satPositions[sats],
+                              self.halfAngle[sats], minElevation[ground])
+
+        keep = margin >= 0
+        return ground[keep], sats[keep], ranges[keep]
+
+    def _islLinks(self, satPositions):
+        # (satellite, satellite, range) of every ISL at one timestep
+        pairs = cKDTree(satPositions).query_pairs(self.maxIslRange, output_type="ndarray")
+        first, second = pairs[:, 0], pairs[:, 1]
+
+        #Closest approach of the line of sight to the Earth's centre
+        start = satPositions[first]
+        delta = satPositions[second] - start
+        ranges = np.linalg.norm(delta, axis=1)
+        fraction = np.clip(-np.sum(start * delta, axis=1) / ranges**2, 0, 1)
+        closest = np.linalg.norm(start + fraction[:, None] * delta, axis=1)
+
+        keep = closest >= EARTH_MEAN_RADIUS + self.grazingAltitude
+        return first[keep], second[keep], ranges[keep]
+
+    def _adjacency(self, groundPositions, satPositions):
+        numSats = len(self.ephemerides)
+        numGround = len(self.groundNodes)
+
+        ground, sats, groundRanges = self._groundLinks(groundPositions, satPositions)
+        first, second, islRanges = self._islLinks(satPositions)
+
+        # Directed links: ISLs both ways, transmitters up to satellites, and
+        # satellites down to receivers. Weights are one-way latencies (sec).
+        rows = np.concatenate((first, second, numSats + ground, sats))
+        cols = np.concatenate((second, first, sats, numSats + numGround + ground))
+        ranges = np.concatenate((islRanges, islRanges, groundRanges, groundRanges))
+
+        return csr_matrix((ranges / SPEED_OF_LIGHT, (rows, cols)),
+                          shape=(self.numNodes, self.numNodes))
+
+    def adjacency(self, time):
+        """Sparse (nodes, nodes) latency matrix (sec) at one time (EpSec).
+        Nodes are ordered as in nodeNames."""
+        times = np.array([time], dtype=np.float64)
+        satPositions = np.stack([ephemeris.interpolate(times)[0][0] for ephemeris in self.ephemerides])
+        groundPositions = np.stack([np.broadcast_to(observerPositions(node, times), (1, 3))[0]
+                                    for node in self.groundNodes])
+        return self._adjacency(groundPositions, satPositions)
+
+    def solve(self, times, pairs):
+        """Lowest-latency paths for (source, destination) ground object name
+        pairs at every time (EpSec), returned as a LinkGraphResult."""
+        times = np.asarray(times, dtype=np.float64)
+        numSats = len(self.ephemerides)
+        numGround = len(self.groundNodes)
+
+        groundIndex = {node.name: row for row, node in enumerate(self.groundNodes)}
+        sources = sorted({groundIndex[source] for source, _ in pairs})
+        sourceRow = {source: row for row, source in enumerate(sources)}
+
+        latency = np.full((len(times), len(pairs)), np.inf)
+        paths = {pair: [] for pair in pairs}
+
+        for first in range(0, len(times), TIME_BLOCK):
+            block = times[first:first + TIME_BLOCK]
+            satPositions = np.stack([ephemeris.interpolate(block)[0] for ephemeris in self.ephemerides], axis=1)
+            groundPositions = np.stack([np.broadcast_to(observerPositions(node, block), (len(block), 3))
+                                        for node in self.groundNodes], axis=1)
+
+            for step in range(len(block)):
+                graph = self._adjacency(groundPositions[step], satPositions[step])
+                distances, predecessors = dijkstra(graph, indices=[numSats + source for source in sources],
+                                                   return_predecessors=True)
+
+                for col, pair in enumerate(pairs):
+                    row = sourceRow[groundIndex[pair[0]]]
+                    node = numSats + numGround + groundIndex[pair[1]]
+                    latency[first + step, col] = distances[row, node]
+
+                    if np.isinf(distances[row, node]):
+                        paths[pair].append(None)
+                        continue
+
+                    path = [node]
+                    while predecessors[row, path[-1]] >= 0:
+                        path.append(predecessors[row, path[-1]])
+                    paths[pair].append(tuple(self.nodeNames[hop] for hop in reversed(path)))
+
+        return LinkGraphResult(times, list(pairs), latency, paths)
+
+##############################################################################
+##############################################################################
+
+#End
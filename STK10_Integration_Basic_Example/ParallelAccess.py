@@ -0,0 +1,311 @@
+# Parallel Access for the STK Master Integration Certification Script
+
+# Evaluates FacsToSensors style access (facilities to the sensor constellation)
+# across a pool of worker processes. The constellation ephemeris is published
+# once in shared memory and every worker maps it as numpy views, so memory
+# stays flat as workers are added. Facilities (or time windows) are sharded
+# across the workers and the results are merged into per-facility interval
+# lists, in the same (start, stop, duration) form as the chain's
+# 'Object Access' data provider.
+
+# Workers are started with the 'spawn' method (the only one on Windows), which
+# re-imports the launching script in every worker. Only call
+# computeAccessParallel from under an if __name__ == "__main__": guard, as
+# ParallelAccessExample.py does, so that workers do not re-run the scenario.
+##############################################################################
+##############################################################################
+
+#Import basic utilities
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing import shared_memory
+import os
+import sys
+import numpy as np
+
+from AccessGeometry import accessMargin, marginToIntervals, mergeIntervals
+from EphemerisCache import interpolateStates
+
+# Number of time samples evaluated at once by a worker. This bounds each
+# worker's temporary arrays to (satellites, TIME_BLOCK, 3).
+TIME_BLOCK = 2048
+
+# Below this many facility-satellite samples, spawning workers (each of which
+# re-imports numpy) costs more than the evaluation itself, so access is
+# computed in-process. About 0.3 s of serial work on one core; see
+# ParallelAccessBenchmark.py.
+MIN_PARALLEL_WORK = 2_000_000
+
+##############################################################################
+##############################################################################
+
+class SharedEphemeris:
+    """Ephemerides of several objects, published in one shared memory block.
+
+    The times, positions and (if every object has them) velocities of all
+    objects are packed back to back; descriptor holds the block name and
+    per-object offsets, and is all a worker needs to attach to the arrays.
+    Use as a context manager, so the block is unlinked when done.
+    """
+
+    def __init__(self, ephemerides):
+        ephemerides = list(ephemerides)
+        if not ephemerides:
+            raise ValueError("SharedEphemeris needs at least one ephemeris")
+
+        lengths = [len(ephemeris.times) for ephemeris in ephemerides]
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        hasVelocities = all(ephemeris.velocities is not None for ephemeris in ephemerides)
+
+        numPoints = min(ephemeris.numPoints for ephemeris in ephemerides)
+        paths = [ephemeris.path for ephemeris in ephemerides]
+
+        numSamples = int(offsets[-1])
+        numColumns = 7 if hasVelocities else 4
+        self.shm = shared_memory.SharedMemory(create=True, size=max(numSamples * numColumns * 8, 1))
+
+        self.descriptor = {"name": self.shm.name,
+                           "offsets": offsets.tolist(),
+                           "hasVelocities": hasVelocities,
+                           "numPoints": numPoints,
+                           "paths": paths}
+
+        #Do not leak the block if copying in fails, eg. on mismatched shapes
+        try:
+            _copyIn(self.shm, self.descriptor, ephemerides)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        # Unlink first, so the block is freed even if a view into it is still
+        # alive (eg. in a traceback) and closing the mapping is refused.
+        self.shm.unlink()
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _sharedViews(shm, descriptor):
+    # Flat (times, positions, velocities) views onto the shared memory block.
+    numSamples = descriptor["offsets"][-1]
+    buffer = np.ndarray((numSamples * (7 if descriptor["hasVelocities"] else 4),),
+                        dtype=np.float64, buffer=shm.buf)
+
+    times = buffer[:numSamples]
+    positions = buffer[numSamples:4 * numSamples].reshape(numSamples, 3)
+    velocities = buffer[4 * numSamples:].reshape(numSamples, 3) if descriptor["hasVelocities"] else None
+    return times, positions, velocities
+
+def _copyIn(shm, descriptor, ephemerides):
+    # Copy every object's samples into its slot of the shared memory block.
+    times, positions, velocities = _sharedViews(shm, descriptor)
+    offsets = descriptor["offsets"]
+    for ephemeris, first, last in zip(ephemerides, offsets[:-1], offsets[1:]):
+        times[first:last] = ephemeris.times
+        positions[first:last] = ephemeris.positions
+        if velocities is not None:
+            velocities[first:last] = ephemeris.velocities
+
+def attachEphemeris(descriptor):
+    """Attach to a SharedEphemeris from another process. Returns the shared
+    memory handle (keep it alive while the views are in use) and a list of
+    per-object (times, positions, velocities) views, without copying."""
+    shm = shared_memory.SharedMemory(name=descriptor["name"])
+    times, positions, velocities = _sharedViews(shm, descriptor)
+
+    offsets = descriptor["offsets"]
+    views = [(times[first:last], positions[first:last],
+              None if velocities is None else velocities[first:last])
+             for first, last in zip(offsets[:-1], offsets[1:])]
+    return shm, views
+
+##############################################################################
+##############################################################################
+
+def _satelliteState(views, positions, velocities, numPoints):
+    # Interpolation state for the access evaluation. views are per-satellite
+    # (times, positions, velocities); positions and velocities are the same
+    # samples packed back to back, as in a SharedEphemeris.
+    state = {"numPoints": numPoints, "numSats": len(views)}
+
+    # Satellites propagated at the same step share their sample times. Their
+    # samples are then viewed as one (times, satellites, 3) array, so that
+    # the interpolation basis is computed once for all of them.
+    times = views[0][0]
+    if all(np.array_equal(satTimes, times) for satTimes, _, _ in views):
+        def stack(states):
+            if states is None:
+                return None
+            return states.reshape(len(views), len(times), 3).transpose(1, 0, 2)
+
+        state["groups"] = [(times, stack(positions), stack(velocities))]
+    else:
+        state["groups"] = [(satTimes, satPos[:, None], None if satVel is None else satVel[:, None])
+                           for satTimes, satPos, satVel in views]
+    return state
+
+def _facilityIntervals(state, facilityIndices, facilityPositions, times, halfAngle, minElevation):
+    # Access margin of every facility in the shard to the closest-to-visible
+    # sensor, over the given times, turned into intervals per facility.
+    halfAngle = np.broadcast_to(np.asarray(halfAngle, dtype=np.float64), (state["numSats"],))[:, None]
+    margins = np.empty((len(facilityIndices), len(times)))
+
+    for first in range(0, len(times), TIME_BLOCK):
+        block = slice(first, first + TIME_BLOCK)
+        satPositions = np.concatenate([interpolateStates(satTimes, satPos, satVel, times[block],
+                                                         state["numPoints"])[0]
+                                       for satTimes, satPos, satVel in state["groups"]],
+                                      axis=1).transpose(1, 0, 2)
+
+        for row, facilityPosition in enumerate(facilityPositions):
+            margins[row, block] = accessMargin(facilityPosition, satPositions,
+                                               halfAngle, minElevation).max(axis=0)
+
+    return {idx: marginToIntervals(times, margin)
+            for idx, margin in zip(facilityIndices, margins)}
+
+def peakRss():
+    """Peak resident set size of this process in bytes, or None if unknown.
+    Pages of a shared memory block that the process has touched count too."""
+    try:
+        import resource
+    except ImportError:
+        #Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset
+
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxRss if sys.platform == "darwin" else maxRss * 1024
+
+##############################################################################
+##############################################################################
+
+# Per-worker state, set once by the pool initializer
+_worker = {}
+
+def _initWorker(descriptor):
+    _worker["shm"], views = attachEphemeris(descriptor)
+    _, positions, velocities = _sharedViews(_worker["shm"], descriptor)
+    _worker.update(_satelliteState(views, positions, velocities, descriptor["numPoints"]))
+
+def _accessTask(facilityIndices, facilityPositions, times, halfAngle, minElevation):
+    intervals = _facilityIntervals(_worker, facilityIndices, facilityPositions, times,
+                                   halfAngle, minElevation)
+    return intervals, os.getpid(), peakRss()
+
+##############################################################################
+##############################################################################
+
+def computeAccess(ephemerides, facilityNames, facilityPositions, times,
+                  halfAngle, minElevation=0.0):
+    """Access from each facility to any of the sensors, computed in this
+    process. Takes the same arguments as computeAccessParallel and returns
+    the same intervals; it is also its fallback for small inputs."""
+    ephemerides = list(ephemerides)
+    if not ephemerides:
+        raise ValueError("computeAccess needs at least one satellite ephemeris")
+
+    times = np.asarray(times, dtype=np.float64)
+    if len(facilityNames) == 0 or len(times) < 2:
+        return {facilityName: [] for facilityName in facilityNames}
+
+    views = [(ephemeris.times, ephemeris.positions, ephemeris.velocities) for ephemeris in ephemerides]
+    positions = np.concatenate([ephemeris.positions for ephemeris in ephemerides])
+    velocities = None if any(ephemeris.velocities is None for ephemeris in ephemerides) else \
+        np.concatenate([ephemeris.velocities for ephemeris in ephemerides])
+    state = _satelliteState(views, positions, velocities,
+                            min(ephemeris.numPoints for ephemeris in ephemerides))
+
+    intervals = _facilityIntervals(state, list(range(len(facilityNames))),
+                                   np.asarray(facilityPositions, dtype=np.float64),
+                                   times, halfAngle, minElevation)
+    return {facilityNames[idx]: facilityIntervals for idx, facilityIntervals in intervals.items()}
+
+def computeAccessParallel(ephemerides, facilityNames, facilityPositions, times,
+                          halfAngle, minElevation=0.0, numWorkers=None,
+                          shardBy="time", minParallelWork=MIN_PARALLEL_WORK,
+                          stats=None):
+    """Access from each facility to any of the sensors, computed in parallel.
+
+    ephemerides are the cached Ephemeris objects of the sensors' parent
+    satellites, and halfAngle (deg) is the sensor cone half angle, either one
+    value or one per satellite. facilityPositions are Earth-fixed (km) and
+    times are epoch seconds. shardBy is "time" (the default, each worker
+    interpolates only its own window) or "facility" (each worker interpolates
+    the whole span, which only pays off for many facilities). Returns a dict
+    of facility name -> list of (start, stop, duration) intervals, which are
+    all empty if there are fewer than two times.
+
+    Below minParallelWork facility-satellite samples, starting a pool costs
+    more than it saves, so the access is computed in this process by
+    computeAccess instead (pass 0 to always use the pool). If stats is a dict,
+    it is filled with the mode used ("serial" or "parallel"), the number of
+    workers and each worker's peak RSS in bytes.
+    """
+    if shardBy not in ("facility", "time"):
+        raise ValueError(f"shardBy must be 'facility' or 'time', not {shardBy!r}")
+
+    ephemerides = list(ephemerides)
+    if not ephemerides:
+        raise ValueError("computeAccessParallel needs at least one satellite ephemeris")
+
+    numWorkers = numWorkers or os.cpu_count()
+    facilityPositions = np.asarray(facilityPositions, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+    allFacilities = np.arange(len(facilityNames))
+
+    #Intervals need at least two samples, and there is nothing to shard
+    #without facilities, so skip the pool entirely. Small inputs are also
+    #cheaper to evaluate here than to ship to freshly spawned workers.
+    work = len(facilityNames) * len(ephemerides) * len(times)
+    if len(facilityNames) == 0 or len(times) < 2 or work < minParallelWork:
+        if stats is not None:
+            stats.update(mode="serial", workers=0, workerPeakRss=[])
+        return computeAccess(ephemerides, facilityNames, facilityPositions, times,
+                             halfAngle, minElevation)
+
+    tasks = []
+    if shardBy == "facility":
+        for shard in np.array_split(allFacilities, min(numWorkers, len(allFacilities))):
+            tasks.append((shard.tolist(), facilityPositions[shard], times))
+    else:
+        #Adjacent windows share their boundary sample, so that accesses
+        #crossing a boundary merge back into a single interval
+        bounds = np.linspace(0, len(times) - 1, min(numWorkers, len(times) - 1) + 1).astype(int)
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            tasks.append((allFacilities.tolist(), facilityPositions, times[first:last + 1]))
+
+    results = {idx: [] for idx in allFacilities.tolist()}
+    workerPeakRss = {}
+    with SharedEphemeris(ephemerides) as shared, \
+         ProcessPoolExecutor(max_workers=len(tasks), mp_context=get_context("spawn"),
+                             initializer=_initWorker, initargs=(shared.descriptor,)) as pool:
+
+        futures = [pool.submit(_accessTask, *task, halfAngle, minElevation) for task in tasks]
+        for future in futures:
+            intervals, pid, rss = future.result()
+            workerPeakRss[pid] = rss
+            for idx, facilityIntervals in intervals.items():
+                results[idx].extend(facilityIntervals)
+
+    if stats is not None:
+        stats.update(mode="parallel", workers=len(workerPeakRss),
+                     workerPeakRss=list(workerPeakRss.values()))
+
+    return {facilityNames[idx]: mergeIntervals(intervals)
+            for idx, intervals in results.items()}
+
+##############################################################################
+##############################################################################
+
+#End
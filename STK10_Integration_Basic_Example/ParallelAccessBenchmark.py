@@ -0,0 +1,118 @@
+# Parallel Access Benchmark for the STK Master Integration Certification Script
+
+# Times the in-process access evaluation against computeAccessParallel with
+# 1, 2, 4 and one worker per CPU, and reports each worker's peak resident set
+# size. It does not need STK: the constellation is a synthetic stand-in for
+# the scenario's, 4 planes of 8 circular polar satellites at the same
+# altitude, sampled every 60 sec over a day, with randomly placed facilities.
+# Workers are spawned, so everything runs under the __main__ guard.
+##############################################################################
+##############################################################################
+
+#Import basic utilities
+import os
+import time
+import numpy as np
+
+from AccessGeometry import geodeticToFixed
+from EphemerisCache import Ephemeris
+from ParallelAccess import computeAccess, computeAccessParallel, peakRss
+
+#Earth gravitational parameter (km^3/sec^2) and rotation rate (rad/sec)
+EARTH_MU = 398600.4418
+EARTH_ROTATION = 7.292115e-5
+
+##############################################################################
+##############################################################################
+
+def circularOrbit(times, semiMajorAxis, inclination, raan, argLatitude):
+    # Earth-fixed position and velocity (km, km/sec) of a circular orbit,
+    # angles in degrees, with the Earth-fixed frame aligned at time 0.
+    meanMotion = np.sqrt(EARTH_MU / semiMajorAxis**3)
+    u = np.radians(argLatitude) + meanMotion * times
+    inc, node = np.radians(inclination), np.radians(raan)
+
+    inPlane = semiMajorAxis * np.stack((np.cos(u), np.sin(u)), axis=-1)
+    inPlaneVel = semiMajorAxis * meanMotion * np.stack((-np.sin(u), np.cos(u)), axis=-1)
+    toInertial = np.array([[np.cos(node), -np.sin(node) * np.cos(inc)],
+                           [np.sin(node), np.cos(node) * np.cos(inc)],
+                           [0.0, np.sin(inc)]])
+    inertial = inPlane @ toInertial.T
+    inertialVel = inPlaneVel @ toInertial.T
+
+    theta = EARTH_ROTATION * times
+    c, s = np.cos(theta), np.sin(theta)
+    positions = np.stack((c * inertial[:, 0] + s * inertial[:, 1],
+                          -s * inertial[:, 0] + c * inertial[:, 1],
+                          inertial[:, 2]), axis=-1)
+    velocities = np.stack((c * inertialVel[:, 0] + s * inertialVel[:, 1] + EARTH_ROTATION * positions[:, 1],
+                           -s * inertialVel[:, 0] + c * inertialVel[:, 1] - EARTH_ROTATION * positions[:, 0],
+                           inertialVel[:, 2]), axis=-1)
+    return positions, velocities
+
+def syntheticConstellation(numPlanes=4, satsPerPlane=8, span=86400.0, stepSize=60.0):
+    # Ephemerides of a Walker-like polar constellation, planes staggered by
+    # half a satellite spacing
+    times = np.arange(0.0, span + stepSize, stepSize)
+    ephemerides = []
+    for plane in range(numPlanes):
+        for sat in range(satsPerPlane):
+            positions, velocities = circularOrbit(times, 7159.0, 86.4, 180.0 * plane / numPlanes,
+                                                  360.0 * (sat + 0.5 * (plane % 2)) / satsPerPlane)
+            ephemerides.append(Ephemeris(f"Satellite/Sat{plane + 1}{sat + 1}", times, positions, velocities))
+    return ephemerides
+
+def megabytes(numBytes):
+    return "n/a" if numBytes is None else f"{numBytes / 2**20:.0f}"
+
+##############################################################################
+##############################################################################
+
+if __name__ == "__main__":
+
+    satelliteEphemerides = syntheticConstellation()
+
+    #Facilities spread uniformly over the globe
+    numFacilities = 20
+    rng = np.random.default_rng(0)
+    latitudes = np.degrees(np.arcsin(rng.uniform(-1, 1, numFacilities)))
+    longitudes = rng.uniform(-180, 180, numFacilities)
+    facilityNames = [f"Fac{facilityNum + 1:02}" for facilityNum in range(numFacilities)]
+    facilityPositions = geodeticToFixed(latitudes, longitudes)
+
+    accessTimes = np.arange(0.0, 86400.0, 10.0)
+    work = numFacilities * len(satelliteEphemerides) * len(accessTimes)
+    print(f"{len(satelliteEphemerides)} satellites, {numFacilities} facilities, "
+          f"{len(accessTimes)} samples ({work:.2e} facility-satellite samples), "
+          f"{os.cpu_count()} CPUs")
+
+    ##########################################################################
+    ##########################################################################
+
+    tic = time.perf_counter()
+    serialAccess = computeAccess(satelliteEphemerides, facilityNames, facilityPositions,
+                                 accessTimes, halfAngle=62.5)
+    serialTime = time.perf_counter() - tic
+    print(f"\n{'workers':>8} {'wall (s)':>9} {'speedup':>8}  peak RSS per worker (MB)")
+    print(f"{'serial':>8} {serialTime:9.2f} {1.0:8.2f}  {megabytes(peakRss())} (this process)")
+
+    for numWorkers in sorted({1, 2, 4, os.cpu_count()}):
+        stats = {}
+        tic = time.perf_counter()
+        parallelAccess = computeAccessParallel(satelliteEphemerides, facilityNames, facilityPositions,
+                                               accessTimes, halfAngle=62.5, numWorkers=numWorkers,
+                                               minParallelWork=0, stats=stats)
+        parallelTime = time.perf_counter() - tic
+
+        #The time shards must merge back into the serial intervals
+        for facilityName in facilityNames:
+            assert len(parallelAccess[facilityName]) == len(serialAccess[facilityName])
+            assert np.allclose(parallelAccess[facilityName], serialAccess[facilityName])
+
+        workerRss = ", ".join(megabytes(rss) for rss in stats["workerPeakRss"])
+        print(f"{numWorkers:8} {parallelTime:9.2f} {serialTime / parallelTime:8.2f}  {workerRss}")
+
+##############################################################################
+##############################################################################
+
+#End
@@ -0,0 +1,93 @@
+# Parallel Access Example for the STK Master Integration Certification Script
+
+# Evaluates the FacsToSensors access across worker processes. Workers are
+# spawned, which re-runs the launching script in each of them, so everything
+# below is kept under the if __name__ == "__main__": guard. Run this with the
+# IntegrationCertification scenario (from IntegrationCertFullScript.py) still
+# open in STK: it attaches to the running application and rebuilds the
+# facility positions and satellite ephemerides from the scenario.
+##############################################################################
+##############################################################################
+
+#Import basic utilities
+import numpy as np
+
+from AccessGeometry import geodeticToFixed, maxOutage
+from EphemerisCache import EphemerisCache
+from ParallelAccess import computeAccessParallel
+
+##############################################################################
+##############################################################################
+
+if __name__ == "__main__":
+
+    #Attach to the running STK10 Application
+    from comtypes.client import GetActiveObject
+    uiApp = GetActiveObject("STK10.Application")
+    stkRoot = uiApp.Personality2
+
+    from comtypes.gen import STKObjects
+
+    scenario = stkRoot.CurrentScenario
+    scenario2 = scenario.QueryInterface(STKObjects.IAgScenario)
+
+    ##########################################################################
+    ##########################################################################
+
+    #Facility positions, Earth-fixed (km)
+    facilityNames = []
+    facilityPositions = []
+    for facility in scenario.Children.GetElements(STKObjects.eFacility):
+        facility2 = facility.QueryInterface(STKObjects.IAgFacility)
+        lat, lon, alt = facility2.Position.QueryPlanetodetic() #deg, deg, km
+        facilityNames.append(facility.InstanceName)
+        facilityPositions.append(geodeticToFixed(lat, lon, alt))
+
+    #Satellite ephemerides, sampled once into the cache
+    ephemerisCache = EphemerisCache(stkRoot, stepSize=60.0, tolerance=1e-3)
+    satelliteEphemerides = [ephemerisCache.get(satellite) for satellite in scenario.Children.GetElements(STKObjects.eSatellite)]
+    accessTimes = np.arange(satelliteEphemerides[0].times[0], satelliteEphemerides[0].times[-1], 10.0)
+
+    ##########################################################################
+    ##########################################################################
+
+    # The satellite ephemerides are published once in shared memory, and the
+    # time span is sharded across the workers.
+    parallelAccess = computeAccessParallel(satelliteEphemerides, facilityNames, facilityPositions,
+                                           accessTimes, halfAngle=62.5)
+
+    #Compare against STK's own FacsToSensors chain, in epoch seconds
+    unitPrefs = stkRoot.UnitPreferences
+    previousDateFormat = unitPrefs.GetCurrentUnitAbbrv("DateFormat")
+    unitPrefs.SetCurrentUnit("DateFormat", "EpSec")
+    try:
+        chain = scenario.Children.Item("FacsToSensors")
+        facilityAccess = chain.DataProviders.Item('Object Access').QueryInterface(STKObjects.IAgDataPrvInterval).Exec(scenario2.StartTime, scenario2.StopTime)
+
+        stkAccess = {}
+        for facilityNum, facilityName in enumerate(facilityNames):
+            facilityDataSet = facilityAccess.Intervals.Item(facilityNum).DataSets
+            startTimes = facilityDataSet.GetDataSetByName("Start Time").GetValues()
+            stopTimes = facilityDataSet.GetDataSetByName("Stop Time").GetValues()
+            stkAccess[facilityName] = [(float(start), float(stop), float(stop) - float(start))
+                                       for start, stop in zip(startTimes, stopTimes)]
+    finally:
+        unitPrefs.SetCurrentUnit("DateFormat", previousDateFormat)
+
+    def describeOutage(intervals):
+        outage = maxOutage(intervals)
+        if outage is None:
+            return "No Outage"
+        duration, start, stop = outage
+        return f"{duration:.1f} seconds from {start:.1f} until {stop:.1f} EpSec"
+
+    print("\nParallel access intervals (STK Object Access intervals) and max outage:")
+    for facilityName in facilityNames:
+        print(f"{facilityName}: {len(parallelAccess[facilityName])} ({len(stkAccess[facilityName])})")
+        print(f"    parallel: {describeOutage(parallelAccess[facilityName])}")
+        print(f"    STK:      {describeOutage(stkAccess[facilityName])}")
+
+##############################################################################
+##############################################################################
+
+#End
@@ -0,0 +1,228 @@
+# Streaming Access for the STK Master Integration Certification Script
+
+# Instead of computing access once over the whole scenario and dumping it,
+# advance a rolling window through time and evaluate access for the
+# facilities and the aircraft against the sensor constellation as time goes
+# on. Only the new samples of each window are evaluated; the last sample of
+# the previous window is kept, so that AOS/LOS crossing a window edge is still
+# found. AOS, LOS and outage-threshold events are yielded window by window,
+# and memory stays bounded however long the stream runs.
+
+# The satellite states either come from ephemerides sampled beforehand, which
+# replays their span (eg. the scenario), or from a function that samples them
+# over a given horizon, eg. EphemerisCache.get with a start and stop. The
+# stream then keeps only a short rolling ephemeris per satellite, refreshed a
+# window ahead as it advances, so it is not bound to the scenario span.
+##############################################################################
+##############################################################################
+
+#Import basic utilities
+from collections import deque, namedtuple
+import time
+import numpy as np
+
+from AccessGeometry import accessMargin, crossingTimes, observerPositions
+
+# An AOS, LOS or OUTAGE event of one observer. duration is the outage that
+# ended at an AOS, the access that ended at a LOS, or the outage threshold
+# that was exceeded, in seconds (None when it started before the stream).
+AccessEvent = namedtuple("AccessEvent", ["time", "name", "kind", "duration"])
+
+# One window step: its time span (EpSec), its events in time order, and the
+# wall-clock seconds it took to compute.
+StreamWindow = namedtuple("StreamWindow", ["start", "stop", "events", "latency"])
+
+# A facility or aircraft. position is a fixed Earth-fixed position (km) or an
+# Ephemeris; sensors are the indices of the satellites whose sensors it uses
+# (None for all of them).
+Observer = namedtuple("Observer", ["name", "position", "minElevation", "sensors"])
+
+##############################################################################
+##############################################################################
+
+class StreamingAccess:
+    """Rolling-window access between observers and the sensor constellation.
+
+    ephemerides are the cached Ephemeris objects of the sensors' parent
+    satellites, or a function sampleEphemerides(start, stop) returning them
+    over that horizon (EpSec). halfAngle (deg) is the sensor cone half angle,
+    one value or one per satellite. Each window advances windowSize seconds, sampled every
+    sampleStep seconds. An OUTAGE event is raised once an observer has been
+    without access for outageThreshold seconds. A moving observer only
+    exists within its ephemeris span: its AOS/LOS are clamped to the span,
+    and time outside of it does not count towards an outage.
+    """
+
+    def __init__(self, ephemerides, observers, halfAngle, windowSize=600.0,
+                 sampleStep=10.0, outageThreshold=1800.0, latencyHistory=1000):
+        if callable(ephemerides):
+            self.sampleEphemerides = ephemerides
+            self.ephemerides = []
+        else:
+            self.sampleEphemerides = None
+            self.ephemerides = list(ephemerides)
+        self.observers = list(observers)
+        self.halfAngle = np.asarray(halfAngle, dtype=np.float64)
+        self.windowSize = windowSize
+        self.sampleStep = sampleStep
+        self.outageThreshold = outageThreshold
+        self.latencies = deque(maxlen=latencyHistory)
+        self.states = []
+
+    def _margins(self, times):
+        # Access margin of every observer to its best placed sensor, (O, T)
+        satPositions = np.stack([ephemeris.interpolate(times)[0]
+                                 for ephemeris in self.ephemerides])
+        halfAngle = np.broadcast_to(self.halfAngle, (len(satPositions),))[:, None]
+
+        margins = np.empty((len(self.observers), len(times)))
+        for row, observer in enumerate(self.observers):
+            sensors = slice(None) if observer.sensors is None else observer.sensors
+            #NaN wherever a moving observer is outside of its ephemeris
+            margins[row] = accessMargin(observerPositions(observer, times),
+                                        satPositions[sensors], halfAngle[sensors],
+                                        observer.minElevation).max(axis=0)
+        return margins
+
+    def _observerEvents(self, state, observer, times, margin):
+        # Walk one observer's AOS/LOS transitions within the window, in time
+        # order, raising an OUTAGE event once an outage passes the threshold.
+        events = []
+        name = observer.name
+        valid = ~np.isnan(margin)
+        visible = valid & (margin >= 0)
+        change = np.flatnonzero((visible[1:] != visible[:-1]) | (valid[1:] != valid[:-1]))
+
+        def checkOutage(now):
+            if state["los"] is not None and not state["alerted"] and \
+               now - state["los"] >= self.outageThreshold:
+                events.append(AccessEvent(state["los"] + self.outageThreshold, name,
+                                          "OUTAGE", self.outageThreshold))
+                state["alerted"] = True
+
+        for idx in change:
+            if valid[idx] and valid[idx + 1]:
+                crossing = float(crossingTimes(times, margin, idx))
+            elif valid[idx + 1]:
+                #Moving observer appears at the start of its ephemeris
+                crossing = float(observer.position.times[0])
+            else:
+                #Moving observer disappears at the end of its ephemeris
+                crossing = float(observer.position.times[-1])
+
+            checkOutage(crossing)
+            if visible[idx + 1] and not visible[idx]:
+                outage = crossing - state["los"] if state["losKnown"] else None
+                events.append(AccessEvent(crossing, name, "AOS", outage))
+                state.update(aos=crossing, los=None, alerted=False)
+            elif visible[idx] and not visible[idx + 1]:
+                duration = None if state["aos"] is None else crossing - state["aos"]
+                events.append(AccessEvent(crossing, name, "LOS", duration))
+                state.update(aos=None, los=crossing if valid[idx + 1] else None,
+                             losKnown=bool(valid[idx + 1]))
+            elif valid[idx + 1]:
+                #Appears without access; its outage is counted from here
+                state.update(los=crossing, losKnown=False, alerted=False)
+            else:
+                #Disappears without access; stop counting its outage
+                state.update(los=None, losKnown=False, alerted=False)
+
+        checkOutage(float(times[-1]))
+        return events
+
+    def _roll(self, windowStart, windowStop, stop):
+        # Resample the satellites from the start of this window to one window
+        # beyond it (but not beyond the stream), once their rolling
+        # ephemerides no longer reach the end of the window. Samples from
+        # before the window are dropped.
+        if self.ephemerides and min(ephemeris.times[-1] for ephemeris in self.ephemerides) >= windowStop:
+            return
+        self.ephemerides = list(self.sampleEphemerides(windowStart, min(windowStop + self.windowSize, stop)))
+
+    def stream(self, start, stop=None):
+        """Yield a StreamWindow per window step from start (EpSec), until stop.
+
+        By default, ephemerides given up front are streamed to the end of
+        their span, and sampled ones indefinitely. A stop beyond the span of
+        the given ephemerides raises ValueError before anything is yielded.
+        """
+        if self.sampleEphemerides is None:
+            first = max(ephemeris.times[0] for ephemeris in self.ephemerides)
+            last = min(ephemeris.times[-1] for ephemeris in self.ephemerides)
+            if stop is None:
+                stop = last
+            if start < first or stop > last:
+                raise ValueError(f"cannot stream {start} to {stop} EpSec, the satellite "
+                                 f"ephemerides span {first} to {last} EpSec; pass a "
+                                 f"sampling function to stream beyond them")
+        elif stop is None:
+            stop = np.inf
+
+        return self._windows(start, stop)
+
+    def _windows(self, start, stop):
+        samplesPerWindow = max(int(round(self.windowSize / self.sampleStep)), 1)
+        edgeTime = None
+        edgeMargins = None
+        if self.sampleEphemerides is not None:
+            self.ephemerides = []
+
+        while True:
+            tic = time.perf_counter()
+
+            if edgeTime is None:
+                #First window: the stream starts at the first sample
+                times = start + self.sampleStep * np.arange(samplesPerWindow + 1)
+            else:
+                times = edgeTime + self.sampleStep * np.arange(1, samplesPerWindow + 1)
+            times = times[times <= stop]
+            if len(times) == 0:
+                return
+
+            if self.sampleEphemerides is not None:
+                self._roll(float(times[0] if edgeTime is None else edgeTime), float(times[-1]), stop)
+            margins = self._margins(times)
+
+            events = []
+            if edgeTime is None:
+                #Observers in access when the stream starts; the outage of
+                #those without access is counted from the start
+                self.states = []
+                for observer, margin in zip(self.observers, margins):
+                    state = {"aos": None, "los": None, "losKnown": False, "alerted": False}
+                    if margin[0] >= 0:
+                        events.append(AccessEvent(float(times[0]), observer.name, "AOS", None))
+                    elif not np.isnan(margin[0]):
+                        state["los"] = float(times[0])
+                    self.states.append(state)
+            else:
+                #Reuse the previous window's last sample as this window's edge
+                times = np.concatenate(([edgeTime], times))
+                margins = np.concatenate((edgeMargins, margins), axis=1)
+
+            for observer, state, margin in zip(self.observers, self.states, margins):
+                events += self._observerEvents(state, observer, times, margin)
+            events.sort(key=lambda event: event.time)
+
+            edgeTime, edgeMargins = times[-1], margins[:, -1:]
+
+            latency = time.perf_counter() - tic
+            self.latencies.append(latency)
+            yield StreamWindow(float(times[0]), float(times[-1]), events, latency)
+
+    def latencySummary(self):
+        """Mean, 95th percentile and maximum latency (sec) per window step,
+        over the most recent window steps (all zero before any)."""
+        latencies = np.array(self.latencies)
+        if len(latencies) == 0:
+            return {"windows": 0, "mean": 0.0, "p95": 0.0, "max": 0.0}
+
+        return {"windows": len(latencies),
+                "mean": float(latencies.mean()),
+                "p95": float(np.percentile(latencies, 95)),
+                "max": float(latencies.max())}
+
+##############################################################################
+##############################################################################
+
+#End